@@ -170,6 +170,10 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': os.path.join(BASE_DIR, 'django_error.log'),
         },
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
+        },
     },
     'loggers': {
         'django': {
@@ -178,8 +182,8 @@ LOGGING = {
             'propagate': True,
         },
         'upload': {  # Replace 'yourapp' with the name of your app
-            'handlers': ['file'],
-            'level': 'ERROR',
+            'handlers': ['file', 'console'],
+            'level': 'INFO',  # Load summaries and Redis fallback warnings go to the console; the file still gets errors only
             'propagate': False,
         },
     },
@@ -0,0 +1,51 @@
+import functools
+
+from django.core.management.base import BaseCommand
+from upload.tasks import DEDUP_KEY_FIELDS, DEDUP_KEY_SETS, DEDUP_WARM_SUFFIX, dedup_redis
+
+
+class Command(BaseCommand):
+    help = 'Load the dedup keys of existing booking and refund rows into Redis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Keys fetched and added to Redis per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        for model, set_name in DEDUP_KEY_SETS.items():
+            # Stop trusting the live set while it is rebuilt, so uploads fall back to the DB check meanwhile
+            dedup_redis.delete(set_name + DEDUP_WARM_SUFFIX)
+
+            # Build into a temporary set and swap it in, so the live set is never half-loaded
+            tmp_name = f"{set_name}:loading"
+            dedup_redis.delete(tmp_name)
+
+            total = 0
+            batch = []
+            rows = model.objects.values_list(*DEDUP_KEY_FIELDS[model]).iterator(chunk_size=batch_size)
+            for key in rows:
+                batch.append(':'.join(map(str, key)))
+                if len(batch) >= batch_size:
+                    dedup_redis.sadd(tmp_name, *batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                dedup_redis.sadd(tmp_name, *batch)
+                total += len(batch)
+
+            # Uploads keep adding to the live set while we load; merge those keys in and swap the merged set in
+            dedup_redis.transaction(functools.partial(self.swap_in, tmp_name, set_name), set_name)
+
+            self.stdout.write(self.style.SUCCESS(f"Loaded {total} keys into {set_name}"))
+
+    # Run under WATCH on the live set: if an upload adds to it after the merge, the MULTI is discarded and redis-py
+    # calls this again. An empty merge means both sets are empty, so there is nothing to rename
+    def swap_in(self, tmp_name, set_name, pipe):
+        merged = pipe.sunionstore(tmp_name, [tmp_name, set_name])
+        pipe.multi()
+        if merged:
+            pipe.rename(tmp_name, set_name)
+        else:
+            pipe.delete(set_name)
+        pipe.set(set_name + DEDUP_WARM_SUFFIX, 1)
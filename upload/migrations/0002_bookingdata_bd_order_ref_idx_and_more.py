@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('upload', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookingdata',
+            index=models.Index(fields=['irctc_order_no', 'bank_booking_ref_no'], name='bd_order_ref_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refunddata',
+            index=models.Index(fields=['irctc_order_no', 'bank_booking_ref_no', 'bank_refund_ref_no'], name='rd_order_ref_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Cast, Round
+
+
+RUPEES = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+# Existing rupee amounts are scaled to paise while the columns are still decimal, then the type is switched
+def rupees_to_paise(apps, schema_editor):
+    for model_name, field in (('BookingData', 'booking_amount'), ('RefundData', 'refund_amount')):
+        model = apps.get_model('upload', model_name)
+        # Round and cast to an integer: SQLite holds the decimal as REAL, so 10.05 * 100 is 1005.0000000000001
+        paise = Cast(Round(F(field) * 100), models.BigIntegerField())
+        model.objects.exclude(**{f'{field}__isnull': True}).update(**{field: paise})
+
+
+def paise_to_rupees(apps, schema_editor):
+    for model_name, field in (('BookingData', 'booking_amount'), ('RefundData', 'refund_amount')):
+        model = apps.get_model('upload', model_name)
+        # Scale by a decimal 0.01: F(field) / 100 is integer division on SQLite (CAST AS NUMERIC keeps 100 an
+        # integer there), which would drop the paise; on PostgreSQL this is exact numeric arithmetic
+        rupees = Round(Cast(F(field), RUPEES) * Value(Decimal('0.01'), output_field=RUPEES), 2)
+        model.objects.exclude(**{f'{field}__isnull': True}).update(**{field: rupees})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('upload', '0002_bookingdata_bd_order_ref_idx_and_more'),
+    ]
+
+    operations = [
+        # Widen first so scaling by 100 cannot overflow max_digits
+        migrations.AlterField(
+            model_name='bookingdata',
+            name='booking_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AlterField(
+            model_name='refunddata',
+            name='refund_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.RunPython(rupees_to_paise, paise_to_rupees),
+        migrations.AlterField(
+            model_name='bookingdata',
+            name='booking_amount',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='refunddata',
+            name='refund_amount',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
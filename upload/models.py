@@ -5,7 +5,7 @@ class BookingData(models.Model):
     txn_date = models.DateField(blank=True, null=True)  # Change to DateField for proper date handling
     irctc_order_no = models.BigIntegerField(blank=True, null=True)  # Use BigIntegerField if expecting large order numbers
     bank_booking_ref_no = models.BigIntegerField(blank=True, null=True)  # Change to BigIntegerField
-    booking_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)  # Change to DecimalField
+    booking_amount = models.BigIntegerField(blank=True, null=True)  # Amount in paise (1/100 rupee); divide by 100 for display
     credited_date = models.DateField(blank=True, null=True)  # Change to DateField for consistency
     cus_account_no = models.CharField(max_length=25, blank=True, null=True)
     remarks = models.CharField(max_length=25, blank=True, null=True)
@@ -14,6 +14,9 @@ class BookingData(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['txn_date', 'bank_code', 'credited_date', 'irctc_order_no', 'bank_booking_ref_no'], name='unique_bookingdata_constraint')
         ]
+        indexes = [
+            models.Index(fields=['irctc_order_no', 'bank_booking_ref_no'], name='bd_order_ref_idx')  # Matches the upload dedup lookup
+        ]
 
 class RefundData(models.Model):
     bank_code = models.IntegerField()  # Bank numeric code
@@ -21,7 +24,7 @@ class RefundData(models.Model):
     irctc_order_no = models.BigIntegerField(blank=True, null=True)  # Use BigIntegerField if expecting large order numbers
     bank_booking_ref_no = models.BigIntegerField(blank=True, null=True)  # Change to BigIntegerField
     bank_refund_ref_no = models.BigIntegerField(blank=True, null=True)  # Change to BigIntegerField
-    refund_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)  # Change to DecimalField
+    refund_amount = models.BigIntegerField(blank=True, null=True)  # Amount in paise (1/100 rupee); divide by 100 for display
     debited_date = models.DateField(blank=True, null=True)  # Change to DateField for consistency
     cus_account_no = models.CharField(max_length=25, blank=True, null=True)
     remarks = models.CharField(max_length=25, blank=True, null=True)
@@ -30,3 +33,6 @@ class RefundData(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['refund_date', 'bank_code', 'debited_date', 'irctc_order_no', 'bank_booking_ref_no', 'bank_refund_ref_no'], name='unique_refunddata_constraint')
         ]
+        indexes = [
+            models.Index(fields=['irctc_order_no', 'bank_booking_ref_no', 'bank_refund_ref_no'], name='rd_order_ref_idx')  # Matches the upload dedup lookup
+        ]
@@ -1,19 +1,45 @@
 import pandas as pd
+import numpy as np
 import logging
 from io import StringIO, BytesIO
 from .models import BookingData, RefundData
-from celery import shared_task
-from django.db import connection
-import json
-from pyexcel_ods import get_data as ods_get_data
+from celery import chord, group, shared_task
+from django.conf import settings
+from django.db import connection, transaction
+import redis
+import functools
+import csv
 import re
 
+# Optional C parser used as a fast path for ISO-8601 date columns
+try:
+    import ciso8601
+except ImportError:
+    ciso8601 = None
+
+# Optional multi-threaded CSV reader; pandas' reader is used when it is not installed
+try:
+    import pyarrow as pa
+    from pyarrow import compute as pc, csv as pacsv
+except ImportError:
+    pa = pc = pacsv = None
+
+# Rust-based spreadsheet reader: pandas' 'calamine' engine for .xls/.xlsx and ODS sheets directly,
+# with openpyxl and pyexcel_ods as the fallbacks
+try:
+    from python_calamine import CalamineWorkbook
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    CalamineWorkbook = None
+    EXCEL_ENGINE = 'openpyxl'
+
 
 # For Oracle DB connection
 # import cx_Oracle
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
 # Bank name to code mapping (can be stored in DB)
 BANK_CODE_MAPPING = {
@@ -93,149 +119,505 @@ BANK_MAPPINGS = {
     # Add more bank mappings as needed
 }
 
-# Date parsing helper function with logging
-def try_parse_date(date_str):
-    if pd.isnull(date_str) or date_str.strip() == '':
-        logging.warning(f"Empty or null date string found: {date_str}")
-        return pd.NaT
-
-    date_str = date_str.strip()  # Trim any leading/trailing whitespace
-    logging.info(f"Attempting to parse date string: {date_str}")
-    
-    # Try specific formats first
-    for fmt in ('%d-%b-%y', '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y'):  # Add more formats as needed
+# Characters stripped from column names before matching them against the bank mappings
+_NONWORD = re.compile(r'\W+')
+
+# BANK_MAPPINGS with column names sanitized once at import; tasks only read from this and never mutate it
+CLEANED_BANK_MAPPINGS = {
+    bank: {
+        txn: {
+            'columns': [_NONWORD.sub('', col.strip()) for col in mapping['columns']],
+            'column_mapping': {_NONWORD.sub('', col.strip()): field for col, field in mapping['column_mapping'].items()},
+        }
+        for txn, mapping in txn_mappings.items()
+    }
+    for bank, txn_mappings in BANK_MAPPINGS.items()
+}
+
+# Fields identifying a duplicate row, per model
+DEDUP_KEY_FIELDS = {
+    BookingData: ('irctc_order_no', 'bank_booking_ref_no'),
+    RefundData: ('irctc_order_no', 'bank_booking_ref_no', 'bank_refund_ref_no'),
+}
+
+# Redis sets mirroring the stored dedup keys; the marker key is set by the warm_dedup_keys command
+# once a set holds every key in its table, and only then is the set trusted instead of the database
+DEDUP_KEY_SETS = {
+    BookingData: 'bookingdata:keys',
+    RefundData: 'refunddata:keys',
+}
+DEDUP_WARM_SUFFIX = ':warm'
+
+# Connections are opened lazily, so this is safe to build at import time; the timeouts make an unreachable
+# Redis fail fast into the DB fallback instead of hanging the worker
+dedup_redis = redis.Redis.from_url(settings.CELERY_BROKER_URL, socket_connect_timeout=2, socket_timeout=5)
+
+# Resolve the cleaned mapping and bank code once per (bank, transaction type); lookup failures raise and are not cached
+@functools.lru_cache(maxsize=None)
+def _get_mapping(bank_name, transaction_type):
+    mappings = CLEANED_BANK_MAPPINGS.get(bank_name, {}).get(transaction_type)
+    if not mappings:
+        raise ValueError(f"No mapping found for bank: {bank_name}, transaction type: {transaction_type}")
+
+    bank_code = BANK_CODE_MAPPING.get(bank_name)
+    if not bank_code:
+        raise ValueError(f"No bank code found for bank: {bank_name}")
+
+    return mappings, bank_code
+
+# Number of rows read per chunk when streaming CSV input
+CSV_CHUNK_SIZE = 50_000
+
+# Uploads larger than this are split into slices of about this size and loaded in parallel chunk tasks
+PARALLEL_CHUNK_BYTES = 50 << 20
+
+# Bytes per record batch when streaming CSV input through pyarrow
+ARROW_BLOCK_SIZE = 16 << 20
+
+# Size of the file head inspected when detecting the CSV delimiter
+DELIMITER_SAMPLE_SIZE = 65536
+
+# Date formats tried in order when parsing date columns
+DATE_FORMATS = ('%d-%b-%y', '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y')  # Add more formats as needed
+
+# Detect the delimiter of CSV/TXT content from a sample of its head, defaulting to a comma
+def sniff_delimiter(sample):
+    sample = sample[:sample.rfind('\n') + 1] or sample  # Don't let a truncated last line skew detection
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return ','
+
+# Sniff the delimiter and header of CSV/TXT content and validate the header against the mapping. Returns the
+# delimiter, the raw header names the mapping needs and their cleaned names
+def read_csv_layout(file_content, mappings):
+    sample = file_content[:DELIMITER_SAMPLE_SIZE].decode('utf-8-sig', errors='ignore')
+    delimiter = sniff_delimiter(sample)
+    header = next(csv.reader(StringIO(sample), delimiter=delimiter), [])
+
+    # Validate the header up front: a header-only file yields no chunks, so the per-chunk check would never run
+    cleaned_header = clean_and_validate_columns(pd.Index(header, dtype=object), mappings)
+
+    included = [(col, cleaned) for col, cleaned in zip(header, cleaned_header) if cleaned in mappings['columns']]
+    return delimiter, [col for col, _ in included], [cleaned for _, cleaned in included]
+
+# pyarrow options reading the mapped columns of CSV/TXT content as nullable strings
+def arrow_csv_options(delimiter, include_columns):
+    return {
+        'parse_options': pacsv.ParseOptions(delimiter=delimiter),
+        'convert_options': pacsv.ConvertOptions(
+            column_types={col: pa.string() for col in include_columns},
+            include_columns=include_columns,
+            strings_can_be_null=True,
+        ),
+    }
+
+# Stream the mapped columns of CSV/TXT content as DataFrame chunks of string columns; returns the chunks and their
+# already validated cleaned column names. Nothing is typed at read time: a single malformed key or amount would
+# otherwise fail the whole file after earlier chunks were already committed
+def read_csv_chunks(file_content, mappings):
+    delimiter, include_columns, cleaned_columns = read_csv_layout(file_content, mappings)
+    logger.info("CSV/TXT file opened for chunked reading with delimiter '%s'.", delimiter)
+
+    if pacsv is None:
+        file_str = file_content.decode(errors='ignore')
+        chunks = pd.read_csv(
+            StringIO(file_str), delimiter=delimiter, dtype=str, usecols=include_columns, chunksize=CSV_CHUNK_SIZE
+        )
+        return chunks, cleaned_columns
+
+    # Only materialize the columns the mapping needs
+    reader = pacsv.open_csv(
+        BytesIO(file_content),
+        read_options=pacsv.ReadOptions(block_size=ARROW_BLOCK_SIZE),
+        **arrow_csv_options(delimiter, include_columns),
+    )
+    return (batch.to_pandas() for batch in reader), cleaned_columns
+
+# Coerce a key column (a Series or pyarrow array of strings) to an int64 Series, with anything unparsable as 0.
+# Plain integers are converted exactly and vectorized; going through pd.to_numeric alone would pass a column with
+# gaps through float64 and corrupt large order/reference numbers. Only the remaining cells, e.g. '100001.0', are
+# left to pd.to_numeric
+def coerce_key_col(s):
+    index = s.index if isinstance(s, pd.Series) else None
+    if pa is not None:
+        values = pa.array(s, type=pa.string(), from_pandas=True) if index is not None else s
+        values = pc.utf8_trim_whitespace(values)
+        is_int = pc.fill_null(pc.match_substring_regex(values, r'^-?\d{1,18}$'), False)
+        out = np.array(pc.cast(pc.if_else(is_int, values, '0'), pa.int64()))
+        rest = np.asarray(pc.and_(pc.invert(is_int), pc.is_valid(values)))
+        rest_values = pd.Series(np.asarray(values.filter(pa.array(rest)), dtype=object))
+    else:
         try:
-            return pd.to_datetime(date_str, format=fmt)
+            numbers = pd.to_numeric(s)  # A column of clean integers converts in one call
+            if numbers.dtype.kind == 'i':
+                return pd.Series(numbers.to_numpy(dtype='int64'), index=index)
+        except (ValueError, TypeError):
+            pass
+
+        values = s.astype('string').str.strip()
+        is_int = values.str.fullmatch(r'-?\d{1,18}').fillna(False).astype(bool).to_numpy()
+        out = np.zeros(len(values), dtype='int64')
+        out[is_int] = values[is_int].astype('int64').to_numpy()
+        rest = ~is_int & values.notna().to_numpy()
+        rest_values = values[rest].astype(object)
+
+    if rest.any():
+        numbers = pd.to_numeric(rest_values, errors='coerce')
+        out[rest] = numbers.where(numbers.abs() < 2 ** 63, 0).to_numpy(dtype='int64')
+    return pd.Series(out, index=index)
+
+# Fast path for columns that are entirely ISO-8601; raises ValueError as soon as a value is not
+def parse_iso_date_col(s):
+    values = (ciso8601.parse_datetime_as_naive(value) if isinstance(value, str) else None for value in s.values)
+    return pd.Series(np.fromiter(values, dtype='datetime64[ns]', count=len(s)), index=s.index)
+
+# Vectorized date parsing: each format is tried against the whole column, later formats only see rows still unparsed
+def parse_date_col(s):
+    s = s.str.strip()  # Trim any leading/trailing whitespace
+    s = s.where(s != '')  # Treat empty strings as missing
+
+    if ciso8601 is not None:
+        try:
+            return parse_iso_date_col(s)
         except ValueError:
-            continue
-
-    # If specific formats fail, use a general approach with coercion
+            pass  # Not a pure ISO-8601 column, use the pandas formats below
+
+    out = pd.to_datetime(s, errors='coerce', format=DATE_FORMATS[0])
+    mask = out.isna() & s.notna()
+    for fmt in DATE_FORMATS[1:]:
+        if not mask.any():
+            break
+        out.loc[mask] = pd.to_datetime(s[mask], errors='coerce', format=fmt)
+        mask = out.isna() & s.notna()
+
+    # If specific formats fail, use a general approach with coercion, parsing each distinct string only once
+    if mask.any():
+        cache = {value: pd.to_datetime(value, errors='coerce') for value in s[mask].unique()}
+        out.loc[mask] = s[mask].map(cache)
+
+    return out
+
+# Convert a DataFrame into model field kwargs, turning NaN/NaT into None for the ORM
+def dataframe_to_records(df):
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+# Format each row's dedup key as the member string stored in the model's Redis set
+def format_dedup_keys(df, model):
+    return [':'.join(map(str, key)) for key in zip(*(df[field] for field in DEDUP_KEY_FIELDS[model]))]
+
+# Drop rows whose key repeats within the chunk or already exists, the latter checked against the warmed Redis set
+# or else with one batched DB lookup. The unique constraints can't be relied on for this: they also cover the
+# date columns, and rows with NULL dates never conflict
+def drop_existing_rows(df, model, batch_size=1000):
+    df = df.drop_duplicates(subset=list(DEDUP_KEY_FIELDS[model]))
+    if df.empty:
+        return df
+
+    set_name = DEDUP_KEY_SETS[model]
     try:
-        return pd.to_datetime(date_str, errors='coerce')
-    except Exception as e:
-        logging.error(f"Unable to parse date string: {date_str}. Error: {e}")
-        return pd.NaT
+        if dedup_redis.exists(set_name + DEDUP_WARM_SUFFIX):
+            present = dedup_redis.smismember(set_name, format_dedup_keys(df, model))
+            return df.loc[[not is_member for is_member in present]]
+    except redis.RedisError as e:
+        logger.warning("Redis dedup lookup failed, falling back to the database: %s", e)
+
+    key_fields = DEDUP_KEY_FIELDS[model]
+    order_nos = df['irctc_order_no'].unique().tolist()
+    existing_keys = set()
+    for start in range(0, len(order_nos), batch_size):
+        existing_keys.update(
+            model.objects.filter(irctc_order_no__in=order_nos[start:start + batch_size]).values_list(*key_fields)
+        )
+
+    keys = zip(*(df[field] for field in key_fields))
+    return df.loc[[key not in existing_keys for key in keys]]
+
+# Add the keys of freshly inserted rows to the model's Redis set
+def remember_inserted_keys(df, model):
+    if df.empty:
+        return
+
+    set_name = DEDUP_KEY_SETS[model]
+    try:
+        dedup_redis.sadd(set_name, *format_dedup_keys(df, model))
+    except redis.RedisError as e:
+        logger.warning("Failed to record dedup keys in Redis: %s", e)
+        try:
+            dedup_redis.delete(set_name + DEDUP_WARM_SUFFIX)  # The set is now stale; stop trusting it until re-warmed
+        except redis.RedisError:
+            pass
+
+# COPY is only used on PostgreSQL through psycopg 3, whose cursors expose copy(); other setups use bulk_create
+def supports_copy():
+    if connection.vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return is_psycopg3
+
+# Stream rows into a temp table with COPY, then move them into the model table skipping unique-constraint conflicts;
+# returns the number of rows actually inserted
+def copy_insert(model, df, bank_code):
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    # Qualified with pg_temp so the DROP/COPY/INSERT can never resolve to a permanent table of the same name
+    tmp_table = f'{quote("pg_temp")}.{quote(f"{model._meta.db_table}_copy")}'
+    columns = ', '.join(quote(model._meta.get_field(field).column) for field in ('bank_code', *df.columns))
+
+    # Dates go over the wire as plain dates and missing values as NULL
+    df = df.copy()
+    for col in df.select_dtypes(include='datetime').columns:
+        df[col] = df[col].dt.date
+    df = df.astype(object).where(df.notna(), None)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {tmp_table}")
+        cursor.execute(f"CREATE TEMP TABLE {tmp_table} ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA")
+        with cursor.copy(f"COPY {tmp_table} ({columns}) FROM STDIN") as copy:
+            for record in df.itertuples(index=False, name=None):
+                copy.write_row((bank_code, *record))
+        cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {tmp_table} ON CONFLICT DO NOTHING")
+        return cursor.rowcount
+
+# Insert a chunk of already-deduplicated rows, returning how many were saved. bulk_create(ignore_conflicts=True)
+# can't report dropped rows, so that path counts every row; after drop_existing_rows the constraint only fires
+# when another upload inserted the same row concurrently
+def insert_rows(model, df, bank_code):
+    if df.empty:
+        return 0
+
+    if supports_copy():
+        saved = copy_insert(model, df, bank_code)
+    else:
+        objects = [model(bank_code=bank_code, **record) for record in dataframe_to_records(df)]
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=1000, ignore_conflicts=True)
+        saved = len(objects)
+    remember_inserted_keys(df, model)
+    return saved
+
+# Count rows with an unparsable date; the rows themselves are only formatted when debug logging is on
+def count_invalid_dates(df, date_fields):
+    invalid = df[list(date_fields)].isnull().any(axis=1)
+    if logger.isEnabledFor(logging.DEBUG) and invalid.any():
+        logger.debug("Rows with invalid date formats:\n%s", df.loc[invalid, list(date_fields)])
+    return int(invalid.sum())
+
+# Booking chunk: parse dates, coerce numbers, drop duplicates and bulk insert; returns (saved, skipped, invalid_dates)
+def process_booking_chunk(df, bank_code):
+    df['txn_date'] = parse_date_col(df['txn_date'])
+    df['credited_date'] = parse_date_col(df['credited_date'])
+    invalid_dates = count_invalid_dates(df, ('txn_date', 'credited_date'))
+
+    # Vectorized type coercion; malformed values become 0 instead of failing the chunk
+    df['irctc_order_no'] = coerce_key_col(df['irctc_order_no'])
+    df['bank_booking_ref_no'] = coerce_key_col(df['bank_booking_ref_no'])
+    df['booking_amount'] = (pd.to_numeric(df['booking_amount'], errors='coerce').fillna(0) * 100).round().astype('int64')  # Stored in paise
+
+    total_rows = len(df)
+    df = drop_existing_rows(df, BookingData)
+
+    saved = insert_rows(BookingData, df, bank_code)
+    return saved, total_rows - len(df), invalid_dates
+
+# Refund chunk: parse dates, coerce numbers, drop duplicates and bulk insert; returns (saved, skipped, invalid_dates)
+def process_refund_chunk(df, bank_code):
+    df['refund_date'] = parse_date_col(df['refund_date'])
+    df['debited_date'] = parse_date_col(df['debited_date'])
+    invalid_dates = count_invalid_dates(df, ('refund_date', 'debited_date'))
+
+    # Vectorized type coercion; malformed values become 0 instead of failing the chunk
+    df['irctc_order_no'] = coerce_key_col(df['irctc_order_no'])
+    df['bank_booking_ref_no'] = coerce_key_col(df['bank_booking_ref_no'])
+    df['bank_refund_ref_no'] = coerce_key_col(df['bank_refund_ref_no'])
+    df['refund_amount'] = (pd.to_numeric(df['refund_amount'], errors='coerce').fillna(0) * 100).round().astype('int64')  # Stored in paise
+
+    total_rows = len(df)
+    df = drop_existing_rows(df, RefundData)
+
+    saved = insert_rows(RefundData, df, bank_code)
+    return saved, total_rows - len(df), invalid_dates
+
+CHUNK_PROCESSORS = {
+    'booking': process_booking_chunk,
+    'refund': process_refund_chunk,
+}
+
+TRANSACTION_MODELS = {
+    'booking': BookingData,
+    'refund': RefundData,
+}
+
+# Clean the header once and check it against the mapping; returns the cleaned column names
+def clean_and_validate_columns(columns, mappings):
+    logger.info("Original columns: %s", columns)
+    cleaned_columns = columns.str.strip().str.replace(_NONWORD, '', regex=True)
+    logger.info("Cleaned columns: %s", cleaned_columns)
+
+    # Check for missing columns
+    missing_columns = [col for col in mappings['columns'] if col not in cleaned_columns]
+    if missing_columns:
+        logger.error("Missing columns in DataFrame: %s", missing_columns)
+        raise ValueError(f"Missing columns in DataFrame: {missing_columns}")
+
+    return cleaned_columns.tolist()
+
+# Run one file's content through the chunk pipeline; returns (saved, skipped, invalid_dates)
+def load_file_content(file_content, file_name, bank_name, transaction_type):
+    # Get the specific mappings and bank code for the bank and transaction type
+    mappings, bank_code = _get_mapping(bank_name, transaction_type)
+
+    # CSV-like input is streamed in chunks and its header is validated by the reader; other formats are loaded as
+    # a single chunk and validated below
+    cleaned_columns = None
+    if file_name.endswith('.csv') or file_name.endswith('.txt'):
+        chunks, cleaned_columns = read_csv_chunks(file_content, mappings)
+
+    elif file_name.endswith(('.xlsx', '.xls')):
+        chunks = [pd.read_excel(BytesIO(file_content), engine=EXCEL_ENGINE, dtype=str)]  # Keep everything as string
+        logger.info("Excel file read successfully with engine '%s': %s.", EXCEL_ENGINE, file_name)
+
+    else:
+        logger.info("Unsupported file type %s. Loading it directly into a DataFrame.", file_name)
+        chunks = [load_to_dataframe(BytesIO(file_content), file_name)]  # Function to load other formats
+
+    # Booking or refund-specific logic
+    process_chunk = CHUNK_PROCESSORS.get(transaction_type)
+
+    saved = skipped = invalid_dates = 0
+    for df in chunks:
+        if cleaned_columns is None:
+            cleaned_columns = clean_and_validate_columns(df.columns, mappings)
+        df.columns = cleaned_columns
+
+        # Filter columns based on the mapping and rename them to model field names
+        df = df[mappings['columns']].rename(columns=mappings['column_mapping'])
+
+        if process_chunk:
+            chunk_saved, chunk_skipped, chunk_invalid_dates = process_chunk(df, bank_code)
+            saved += chunk_saved
+            skipped += chunk_skipped
+            invalid_dates += chunk_invalid_dates
+
+    return saved, skipped, invalid_dates
+
+# One summary per file instead of per-row/per-chunk logging
+def log_load_summary(transaction_type, saved, skipped, invalid_dates):
+    if invalid_dates:
+        logger.error("Invalid date formats found in %s data: %d rows", transaction_type, invalid_dates)
+    logger.info("%s load: saved=%d skipped=%d invalid_dates=%d", transaction_type, saved, skipped, invalid_dates)
 
 @shared_task
 def process_uploaded_files(file_content, file_name, bank_name, transaction_type):
-    logging.info(f"Starting to process file: {file_name} for bank: {bank_name}, transaction type: {transaction_type}")
+    logger.info("Starting to process file: %s for bank: %s, transaction type: %s", file_name, bank_name, transaction_type)
 
     try:
-        df = pd.DataFrame()
+        log_load_summary(transaction_type, *load_file_content(file_content, file_name, bank_name, transaction_type))
+        logger.info("Finished processing file: %s", file_name)
+        return f"Successfully processed {file_name}"
 
-        # Set possible delimiters for CSV and text files
-        possible_delimiters = [',', ';', '\t', '|', ' ', '.', '_']
+    except Exception as e:
+        logger.error("Error while processing file %s: %s", file_name, e)
+        return f"Failed to process {file_name}: {str(e)}"
 
-        if file_name.endswith('.csv') or file_name.endswith('.txt'):
-            file_str = file_content.decode(errors='ignore')
-            delimiter = next((delim for delim in possible_delimiters if delim in file_str), ',')
-            df = pd.read_csv(StringIO(file_str), delimiter=delimiter, dtype=str)  # Keep everything as string initially
-            logging.info(f"CSV/TXT file read successfully with delimiter '{delimiter}'.")
+# Chord header task: load one slice of a large CSV upload and report its counts
+@shared_task
+def process_file_chunk(chunk_content, file_name, bank_name, transaction_type):
+    try:
+        saved, skipped, invalid_dates = load_file_content(chunk_content, file_name, bank_name, transaction_type)
+        return {'saved': saved, 'skipped': skipped, 'invalid_dates': invalid_dates}
 
-        elif file_name.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(BytesIO(file_content), engine='openpyxl', dtype=str)  # Keep everything as string
-            logging.info(f"Excel file read successfully: {file_name}.")
+    except Exception as e:
+        logger.error("Error while processing a chunk of file %s: %s", file_name, e)
+        return {'error': str(e)}
 
+# Chord callback: combine the chunk results into the same summary and status message as a single-task upload
+@shared_task
+def finalize_load(chunk_results, file_name, transaction_type):
+    totals = {
+        key: sum(result.get(key, 0) for result in chunk_results)
+        for key in ('saved', 'skipped', 'invalid_dates')
+    }
+    log_load_summary(transaction_type, totals['saved'], totals['skipped'], totals['invalid_dates'])
+
+    errors = [result['error'] for result in chunk_results if 'error' in result]
+    if errors:
+        return f"Failed to process {file_name}: {len(errors)} of {len(chunk_results)} chunks failed, first error: {errors[0]}"
+
+    logger.info("Finished processing file: %s", file_name)
+    return f"Successfully processed {file_name}"
+
+# Split CSV content into roughly chunk_bytes slices of the mapped columns, each a CSV with its own header. Rows are
+# routed by a vectorized hash of their coerced dedup key columns, so every occurrence of a key lands in the same
+# slice (in file order) and concurrent chunk tasks can never insert the same key twice
+def split_csv_content(file_content, mappings, key_fields, chunk_bytes=PARALLEL_CHUNK_BYTES):
+    delimiter, include_columns, _ = read_csv_layout(file_content, mappings)
+    slice_count = -(-len(file_content) // chunk_bytes)
+    if slice_count <= 1:
+        return [file_content]
+
+    key_columns = [
+        col for col in include_columns
+        if mappings['column_mapping'][_NONWORD.sub('', col.strip())] in key_fields
+    ]
+
+    if pacsv is None:
+        df = pd.read_csv(
+            BytesIO(file_content), delimiter=delimiter, dtype=str, usecols=include_columns, encoding_errors='ignore'
+        )
+        keys = pd.DataFrame({col: coerce_key_col(df[col]).to_numpy() for col in key_columns})
+    else:
+        table = pacsv.read_csv(BytesIO(file_content), **arrow_csv_options(delimiter, include_columns))
+        keys = pd.DataFrame({col: coerce_key_col(table.column(col)) for col in key_columns})
+
+    slice_index = pd.util.hash_pandas_object(keys, index=False).to_numpy() % slice_count
+
+    chunks = []
+    for i in range(slice_count):
+        mask = slice_index == i
+        if not mask.any():
+            continue
+        if pacsv is None:
+            chunks.append(df[mask].to_csv(index=False).encode())
         else:
-            logging.info(f"Unsupported file type {file_name}. Converting to CSV.")
-            file_str = convert_to_csv(BytesIO(file_content), file_name)  # Function to convert other formats to CSV
-            df = pd.read_csv(StringIO(file_str), delimiter=',', dtype=str)
-
-        logging.info(f"Original columns: {df.columns}")
-        df.columns = df.columns.str.strip()
-        df.columns = df.columns.to_series().apply(lambda x: re.sub(r'\W+', '', x))
-        logging.info(f"Cleaned columns: {df.columns}")
-
-        # Get the specific mappings for the bank and transaction type
-        mappings = BANK_MAPPINGS.get(bank_name, {}).get(transaction_type)
-
-        if not mappings:
-            raise ValueError(f"No mapping found for bank: {bank_name}, transaction type: {transaction_type}")
-
-        cleaned_mapping_columns = [re.sub(r'\W+', '', col.strip()) for col in mappings['columns']]
-        logging.info(f"Cleaned mapping columns: {cleaned_mapping_columns}")
-        mappings['columns'] = cleaned_mapping_columns
-
-        # Check for missing columns
-        required_columns = mappings['columns']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            logging.error(f"Missing columns in DataFrame: {missing_columns}")
-            raise ValueError(f"Missing columns in DataFrame: {missing_columns}")
-
-        # Filter columns based on the mapping
-        df = df[required_columns]
-
-        # Booking or refund-specific logic
-        if transaction_type == 'booking':
-            df['txn_date'] = df['txn_date'].apply(try_parse_date)
-            df['credited_date'] = df['credited_date'].apply(try_parse_date)
-
-            if df['txn_date'].isnull().any() or df['credited_date'].isnull().any():
-                invalid_dates = df[df['txn_date'].isnull() | df['credited_date'].isnull()]
-                logging.error(f"Invalid date formats found in booking data: {invalid_dates[['txn_date', 'credited_date']]}")
-
-            bank_code = BANK_CODE_MAPPING.get(bank_name)
-            if not bank_code:
-                raise ValueError(f"No bank code found for bank: {bank_name}")
-
-            for _, row in df.iterrows():
-                row['irctc_order_no'] = int(row['irctc_order_no']) if pd.notnull(row['irctc_order_no']) else 0
-                row['bank_booking_ref_no'] = int(row['bank_booking_ref_no']) if pd.notnull(row['bank_booking_ref_no']) else 0
-                row['booking_amount'] = pd.to_numeric(row['booking_amount'], errors='coerce')
-
-                if BookingData.objects.filter(irctc_order_no=row['irctc_order_no'], bank_booking_ref_no=row['bank_booking_ref_no']).exists():
-                    logging.info(f"Duplicate booking found for IRCTC ORDER NO: {row['irctc_order_no']}. Skipping...")
-                else:
-                    BookingData.objects.create(
-                        bank_code=bank_code,
-                        txn_date=row['txn_date'],
-                        credited_date=row['credited_date'],
-                        booking_amount=row['booking_amount'],
-                        irctc_order_no=row['irctc_order_no'],
-                        bank_booking_ref_no=row['bank_booking_ref_no']
-                    )
-                    logging.info(f"Booking data saved for IRCTC ORDER NO: {row['irctc_order_no']}.")
-
-        elif transaction_type == 'refund':
-            df['refund_date'] = df['refund_date'].apply(try_parse_date)
-            df['debited_date'] = df['debited_date'].apply(try_parse_date)
-
-            if df['refund_date'].isnull().any() or df['debited_date'].isnull().any():
-                invalid_dates = df[df['refund_date'].isnull() | df['debited_date'].isnull()]
-                logging.error(f"Invalid date formats found in refund data: {invalid_dates[['refund_date', 'debited_date']]}")
-
-            bank_code = BANK_CODE_MAPPING.get(bank_name)
-            if not bank_code:
-                raise ValueError(f"No bank code found for bank: {bank_name}")
-
-            for _, row in df.iterrows():
-                row['irctc_order_no'] = int(row['irctc_order_no']) if pd.notnull(row['irctc_order_no']) else 0
-                row['bank_booking_ref_no'] = int(row['bank_booking_ref_no']) if pd.notnull(row['bank_booking_ref_no']) else 0
-                row['bank_refund_ref_no'] = int(row['bank_refund_ref_no']) if pd.notnull(row['bank_refund_ref_no']) else 0
-                row['refund_amount'] = pd.to_numeric(row['refund_amount'], errors='coerce')
-
-                if RefundData.objects.filter(irctc_order_no=row['irctc_order_no'], bank_booking_ref_no=row['bank_booking_ref_no']).exists():
-                    logging.info(f"Duplicate refund found for IRCTC ORDER NO: {row['irctc_order_no']}. Skipping...")
-                else:
-                    RefundData.objects.create(
-                        bank_code=bank_code,
-                        refund_date=row['refund_date'],
-                        debited_date=row['debited_date'],
-                        refund_amount=row['refund_amount'],
-                        irctc_order_no=row['irctc_order_no'],
-                        bank_booking_ref_no=row['bank_booking_ref_no'],
-                        bank_refund_ref_no=row['bank_refund_ref_no']
-                    )
-                    logging.info(f"Refund data saved for IRCTC ORDER NO: {row['irctc_order_no']}.")
-
-        logging.info(f"Finished processing file: {file_name}")
-        return f"Successfully processed {file_name}"
+            buffer = BytesIO()
+            pacsv.write_csv(table.filter(pa.array(mask)), buffer)
+            chunks.append(buffer.getvalue())
+
+    return chunks or [file_content]
+
+# Chord dispatcher for a large CSV upload: split it on a worker, then replace this task with a chord of chunk tasks.
+# The chord callback inherits this task's id, so its result is the upload's status message
+@shared_task(bind=True)
+def process_uploaded_files_parallel(self, file_content, file_name, bank_name, transaction_type):
+    logger.info("Splitting file: %s for bank: %s, transaction type: %s", file_name, bank_name, transaction_type)
 
+    try:
+        mappings, _ = _get_mapping(bank_name, transaction_type)
+        key_fields = DEDUP_KEY_FIELDS[TRANSACTION_MODELS[transaction_type]]
+        chunks = split_csv_content(file_content, mappings, key_fields, PARALLEL_CHUNK_BYTES)
     except Exception as e:
-        logging.error(f"Error while processing file {file_name}: {str(e)}")
+        logger.error("Error while splitting file %s: %s", file_name, e)
         return f"Failed to process {file_name}: {str(e)}"
 
+    header = [process_file_chunk.s(chunk, file_name, bank_name, transaction_type) for chunk in chunks]
+    return self.replace(chord(header, finalize_load.s(file_name, transaction_type)))
+
+# Enqueue several uploads at once as one Celery group published over a single broker connection. Large CSV/TXT
+# files go to the chord dispatcher, which splits them on a worker; returns one AsyncResult per file
+def process_uploaded_files_bulk(jobs):
+    signatures = []
+    for file_content, file_name, bank_name, transaction_type in jobs:
+        if file_name.endswith(('.csv', '.txt')) and len(file_content) > PARALLEL_CHUNK_BYTES:
+            task = process_uploaded_files_parallel
+        else:
+            task = process_uploaded_files
+        signatures.append(task.s(file_content, file_name, bank_name, transaction_type))
+
+    if not signatures:
+        return []
+    return group(signatures).apply_async().results
+
 # # Function to compare development and production DB data
 # def compare_db_data(bank_name, year, month):
 #     unmatched_records = []
@@ -255,32 +637,49 @@ def process_uploaded_files(file_content, file_name, bank_name, transaction_type)
 
 #     return unmatched_records
 
-# Function to convert non-CSV/Excel files to CSV
-def convert_to_csv(file_content, file_name):
-    # Implement conversion logic based on file type
+# Function to load non-CSV/Excel files straight into a DataFrame of string columns
+def load_to_dataframe(file_content, file_name):
+    # Implement loading logic based on file type
     try:
         file_content.seek(0)  # Reset file pointer to the start
         content = file_content.read()
 
         # Handle ODS (OpenDocument Spreadsheet) files
         if file_name.endswith('.ods'):
-            logging.info("Converting ODS file to CSV.")
-            data = ods_get_data(file_content)
+            logger.info("Loading ODS file.")
+            file_content.seek(0)
             # Assuming the first sheet contains the data you need
-            sheet_data = data[next(iter(data))]
+            if CalamineWorkbook is not None:
+                sheet_data = CalamineWorkbook.from_filelike(file_content).get_sheet_by_index(0).to_python()
+            else:
+                from pyexcel_ods import get_data as ods_get_data
+                data = ods_get_data(file_content)
+                sheet_data = data[next(iter(data))]
             df = pd.DataFrame(sheet_data[1:], columns=sheet_data[0])  # First row as header
-            return df.to_csv(index=False)
 
         # Handle JSON files
         elif file_name.endswith('.json'):
-            logging.info("Converting JSON file to CSV.")
-            json_data = json.loads(content)
-            df = pd.json_normalize(json_data)  # Flatten JSON if needed
-            return df.to_csv(index=False)
+            logger.info("Loading JSON file.")
+            # Sniff the first byte rather than waiting for lines=True to fail: a single-line array parses as one
+            # JSON Lines record. '[' is a regular document; '{' is a regular object document unless trailing
+            # records make it fail, in which case it is JSON Lines; anything else is JSON Lines
+            first_byte = content.lstrip(b'\xef\xbb\xbf \t\r\n')[:1]
+            if first_byte == b'[':
+                df = pd.read_json(BytesIO(content), dtype=False, convert_dates=False)
+            elif first_byte == b'{':
+                try:
+                    df = pd.read_json(BytesIO(content), dtype=False, convert_dates=False)
+                except ValueError:
+                    df = pd.read_json(BytesIO(content), lines=True, dtype=False, convert_dates=False)
+            else:
+                df = pd.read_json(BytesIO(content), lines=True, dtype=False, convert_dates=False)
 
         else:
             raise ValueError(f"Unsupported file format: {file_name}")
 
+        # Match the CSV/Excel readers: values as strings, missing cells left as NaN
+        return df.astype(str).where(df.notna())
+
     except Exception as e:
-        logging.error(f"Error converting file to CSV: {e}")
-        return ""
+        logger.error("Error loading file %s: %s", file_name, e)
+        raise
@@ -1,3 +1,349 @@
-from django.test import TestCase
+import json
+import logging
+from decimal import Decimal
+from io import BytesIO
+from unittest import addModuleCleanup, mock, skipUnless
 
-# Create your tests here.
+import pandas as pd
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from . import tasks
+from .management.commands import warm_dedup_keys
+from .models import BookingData, RefundData
+
+
+BOOKING_HEADER = "TXN DATE,IRCTC ORDER NO.,BANK BOOKING REF.NO.,BOOKING AMOUNT,CREDITED ON\n"
+
+
+def setUpModule():
+    # Send the app's log records to a NullHandler for the run, so the suite writes nothing to the tracked
+    # django_error.log (or the console); 'upload' doesn't propagate, so that is as far as the records get
+    patcher = mock.patch.object(logging.getLogger('upload'), 'handlers', [logging.NullHandler()])
+    patcher.start()
+    addModuleCleanup(patcher.stop)
+
+
+class UploadTestCase(TestCase):
+    def setUp(self):
+        # Keep the tests off a real Redis: the dedup set is never warm, so the database lookup is used
+        patcher = mock.patch.object(tasks, 'dedup_redis')
+        self.dedup_redis = patcher.start()
+        self.dedup_redis.exists.return_value = 0
+        self.addCleanup(patcher.stop)
+
+    def process(self, content, file_name='upload.csv', transaction_type='booking'):
+        return tasks.process_uploaded_files(content.encode(), file_name, 'karur_vysya', transaction_type)
+
+
+class DedupTests(UploadTestCase):
+    def test_repeated_key_within_upload_is_saved_once(self):
+        content = BOOKING_HEADER + (
+            "05-Jan-24,100002,5002,10.50,06-Jan-24\n"
+            "07-Jan-24,100002,5002,10.50,08-Jan-24\n"
+        )
+        self.assertEqual(self.process(content), "Successfully processed upload.csv")
+        self.assertEqual(BookingData.objects.count(), 1)
+
+    def test_key_already_stored_is_skipped(self):
+        BookingData.objects.create(bank_code=40, irctc_order_no=100001, bank_booking_ref_no=5001)
+        content = BOOKING_HEADER + (
+            "05-Jan-24,100001,5001,10.50,06-Jan-24\n"
+            "05-Jan-24,100003,5003,20.00,06-Jan-24\n"
+        )
+        self.process(content)
+        self.assertEqual(
+            sorted(BookingData.objects.values_list('irctc_order_no', flat=True)), [100001, 100003]
+        )
+
+    def test_refund_repeated_key_within_upload_is_saved_once(self):
+        content = (
+            "REFUND DATE,IRCTC ORDER NO.,BANK BOOKING REF.NO.,BANK REFUND REF.NO.,REFUND AMOUNT,DEBITED ON\n"
+            "05-Jan-24,100002,5002,9002,10.50,\n"
+            "07-Jan-24,100002,5002,9002,10.50,\n"
+        )
+        self.process(content, transaction_type='refund')
+        self.assertEqual(RefundData.objects.count(), 1)
+
+
+class HeaderValidationTests(UploadTestCase):
+    def test_header_only_file_with_missing_columns_fails(self):
+        self.assertTrue(self.process("FOO,BAR\n", file_name='d.csv').startswith("Failed to process d.csv"))
+
+    def test_header_only_file_with_mapped_columns_succeeds(self):
+        self.assertEqual(self.process(BOOKING_HEADER, file_name='d.csv'), "Successfully processed d.csv")
+        self.assertEqual(BookingData.objects.count(), 0)
+
+    def test_csv_header_is_validated_once(self):
+        content = BOOKING_HEADER + "05-Jan-24,100002,5002,10.50,06-Jan-24\n"
+        with mock.patch.object(tasks, 'clean_and_validate_columns', wraps=tasks.clean_and_validate_columns) as validate:
+            self.assertEqual(self.process(content), "Successfully processed upload.csv")
+        self.assertEqual(validate.call_count, 1)
+        self.assertEqual(BookingData.objects.count(), 1)
+
+
+class CoercionTests(UploadTestCase):
+    def test_large_reference_number_with_nulls_is_exact(self):
+        content = BOOKING_HEADER + (
+            "05-Jan-24,100001,9007199254740993,10.50,06-Jan-24\n"
+            "05-Jan-24,100002,,10.50,06-Jan-24\n"
+        )
+        self.process(content)
+        self.assertEqual(
+            BookingData.objects.get(irctc_order_no=100001).bank_booking_ref_no, 9007199254740993
+        )
+
+    def test_malformed_key_is_coerced_instead_of_failing_the_file(self):
+        content = BOOKING_HEADER + (
+            "05-Jan-24,ABC,5001,10.50,06-Jan-24\n"
+            "05-Jan-24,100002.0,5002,10.50,06-Jan-24\n"
+            "05-Jan-24,100003,5003,10.50,06-Jan-24\n"
+        )
+        self.assertEqual(self.process(content), "Successfully processed upload.csv")
+        self.assertEqual(
+            sorted(BookingData.objects.values_list('irctc_order_no', flat=True)), [0, 100002, 100003]
+        )
+
+    def test_malformed_amount_only_nulls_that_cell(self):
+        content = BOOKING_HEADER + (
+            '05-Jan-24,100001,5001,"1,234.50",06-Jan-24\n'
+            "05-Jan-24,100002,5002,10.50,06-Jan-24\n"
+        )
+        self.assertEqual(self.process(content), "Successfully processed upload.csv")
+        self.assertEqual(BookingData.objects.get(irctc_order_no=100001).booking_amount, 0)
+        self.assertEqual(BookingData.objects.get(irctc_order_no=100002).booking_amount, 1050)
+
+
+class WarmDedupKeysTests(TestCase):
+    def warm(self, merged):
+        BookingData.objects.create(bank_code=1, irctc_order_no=1, bank_booking_ref_no=1)
+        with mock.patch.object(warm_dedup_keys, 'dedup_redis') as dedup_redis:
+            call_command('warm_dedup_keys', stdout=mock.Mock())
+
+        self.assertEqual(dedup_redis.mock_calls[0], mock.call.delete('bookingdata:keys:warm'))
+        swap_in, watched = dedup_redis.transaction.call_args_list[0].args
+        self.assertEqual(watched, 'bookingdata:keys')
+
+        pipe = mock.Mock()
+        pipe.sunionstore.return_value = merged
+        swap_in(pipe)
+        return pipe.mock_calls
+
+    def test_rewarm_unsets_marker_first_and_merges_live_set_before_swap(self):
+        self.assertEqual(self.warm(merged=3), [
+            mock.call.sunionstore('bookingdata:keys:loading', ['bookingdata:keys:loading', 'bookingdata:keys']),
+            mock.call.multi(),
+            mock.call.rename('bookingdata:keys:loading', 'bookingdata:keys'),
+            mock.call.set('bookingdata:keys:warm', 1),
+        ])
+
+    def test_empty_merge_skips_the_rename(self):
+        self.assertEqual(self.warm(merged=0)[2:], [
+            mock.call.delete('bookingdata:keys'),
+            mock.call.set('bookingdata:keys:warm', 1),
+        ])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'COPY loading is PostgreSQL-only')
+class CopyInsertTests(UploadTestCase):
+    def test_permanent_table_with_the_temp_name_is_left_alone(self):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE upload_bookingdata_copy (marker integer)')
+            cursor.execute('INSERT INTO upload_bookingdata_copy VALUES (1)')
+
+        content = BOOKING_HEADER + "05-Jan-24,100002,5002,10.50,06-Jan-24\n"
+        self.assertEqual(self.process(content), "Successfully processed upload.csv")
+        self.assertEqual(BookingData.objects.count(), 1)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT marker FROM public.upload_bookingdata_copy')
+            self.assertEqual(cursor.fetchall(), [(1,)])
+
+
+class SniffDelimiterTests(SimpleTestCase):
+    def test_detects_each_supported_delimiter(self):
+        for delimiter in ',;\t|':
+            sample = delimiter.join(['a', 'b', 'c']) + '\n' + delimiter.join(['1', '2', '3']) + '\n'
+            self.assertEqual(tasks.sniff_delimiter(sample), delimiter)
+
+    def test_ignores_a_truncated_last_line(self):
+        self.assertEqual(tasks.sniff_delimiter('a;b;c\n1;2;3\n4;5,6,7,8'), ';')
+
+    def test_falls_back_to_comma(self):
+        self.assertEqual(tasks.sniff_delimiter('single column\nvalue\n'), ',')
+
+
+class ParseDateColTests(SimpleTestCase):
+    def test_mixed_formats_blank_and_invalid_values(self):
+        parsed = tasks.parse_date_col(pd.Series(['05-Jan-24', '2024-01-06', ' 07/01/2024 ', '', 'not a date', None]))
+        self.assertEqual(parsed[:3].dt.strftime('%Y-%m-%d').tolist(), ['2024-01-05', '2024-01-06', '2024-01-07'])
+        self.assertTrue(parsed[3:].isna().all())
+
+    def test_iso_column(self):
+        parsed = tasks.parse_date_col(pd.Series(['2024-01-05', '2024-02-29']))
+        self.assertEqual(parsed.dt.strftime('%Y-%m-%d').tolist(), ['2024-01-05', '2024-02-29'])
+
+
+class SplitCsvContentTests(SimpleTestCase):
+    MAPPINGS = tasks.CLEANED_BANK_MAPPINGS['karur_vysya']['booking']
+    KEY_FIELDS = tasks.DEDUP_KEY_FIELDS[BookingData]
+
+    def rows(self, count):
+        return [f"05-Jan-24,{100000 + i},{5000 + i},10.50,06-Jan-24\n" for i in range(count)]
+
+    def split(self, content, chunk_bytes):
+        return tasks.split_csv_content(content.encode(), self.MAPPINGS, self.KEY_FIELDS, chunk_bytes=chunk_bytes)
+
+    def read(self, chunk):
+        return pd.read_csv(BytesIO(chunk), dtype=str, keep_default_na=False)
+
+    def test_slices_carry_the_header_and_every_row(self):
+        content = BOOKING_HEADER + ''.join(self.rows(200))
+        chunks = self.split(content, chunk_bytes=1000)
+
+        self.assertGreater(len(chunks), 1)
+        frames = [self.read(chunk) for chunk in chunks]
+        for frame in frames:
+            self.assertEqual(list(frame.columns), BOOKING_HEADER.strip().split(','))
+        self.assertCountEqual(
+            pd.concat(frames).to_csv(index=False, header=False).splitlines(keepends=True), self.rows(200)
+        )
+
+    def test_repeated_key_lands_in_one_slice_in_file_order(self):
+        first = "05-Jan-24,100002,5002,10.50,06-Jan-24\n"
+        second = "07-Jan-24,0100002,5002,99.00,08-Jan-24\n"
+        chunks = [self.read(chunk) for chunk in self.split(BOOKING_HEADER + first + ''.join(self.rows(100)) + second, 500)]
+
+        holding = [frame for frame in chunks if frame['BANK BOOKING REF.NO.'].eq('5002').any()]
+        self.assertEqual(len(holding), 1)
+        self.assertEqual(
+            holding[0].loc[holding[0]['BANK BOOKING REF.NO.'] == '5002', 'IRCTC ORDER NO.'].tolist()[-2:],
+            ['100002', '0100002'],
+        )
+
+    def test_content_within_one_slice_is_returned_as_is(self):
+        for content in (BOOKING_HEADER, BOOKING_HEADER + ''.join(self.rows(3))):
+            self.assertEqual(self.split(content, chunk_bytes=1 << 20), [content.encode()])
+
+    def test_missing_columns_fail_the_split(self):
+        with self.assertRaises(ValueError):
+            self.split("TXN DATE,BOOKING AMOUNT\n" + "05-Jan-24,10.50\n" * 100, chunk_bytes=100)
+
+
+class ParallelLoadTests(UploadTestCase):
+    def test_key_repeated_across_slices_is_saved_once(self):
+        content = BOOKING_HEADER + "05-Jan-24,100002,5002,10.50,06-Jan-24\n" + (
+            ''.join(f"05-Jan-24,{200000 + i},{6000 + i},1.00,06-Jan-24\n" for i in range(100))
+        ) + "07-Jan-24,100002,5002,10.50,08-Jan-24\n"
+        chunks = tasks.split_csv_content(
+            content.encode(), SplitCsvContentTests.MAPPINGS, SplitCsvContentTests.KEY_FIELDS, chunk_bytes=500
+        )
+        self.assertGreater(len(chunks), 1)
+
+        # Concurrent chunks: each existence check runs before any other chunk has committed its rows
+        def drop_in_chunk_duplicates(df, model):
+            return df.drop_duplicates(subset=list(tasks.DEDUP_KEY_FIELDS[model]))
+
+        with mock.patch.object(tasks, 'drop_existing_rows', side_effect=drop_in_chunk_duplicates):
+            results = [tasks.process_file_chunk(chunk, 'upload.csv', 'karur_vysya', 'booking') for chunk in chunks]
+        self.assertEqual(
+            tasks.finalize_load(results, 'upload.csv', 'booking'), "Successfully processed upload.csv"
+        )
+        self.assertEqual(BookingData.objects.filter(irctc_order_no=100002).count(), 1)
+        self.assertEqual(BookingData.objects.count(), 101)
+        self.assertEqual(sum(result['skipped'] for result in results), 1)
+
+    def test_dispatcher_replaces_itself_with_a_chord(self):
+        content = (BOOKING_HEADER + ''.join(f"05-Jan-24,{100000 + i},{5000 + i},10.50,06-Jan-24\n" for i in range(50)))
+        dispatcher = tasks.process_uploaded_files_parallel
+        with mock.patch.object(tasks, 'PARALLEL_CHUNK_BYTES', 500), mock.patch.object(tasks, 'chord') as chord, \
+                mock.patch.object(dispatcher, 'replace') as replace:
+            self.assertEqual(dispatcher(content.encode(), 'large.csv', 'karur_vysya', 'booking'), replace.return_value)
+
+        header, callback = chord.call_args.args
+        self.assertGreater(len(header), 1)
+        self.assertTrue(all(sig.task == tasks.process_file_chunk.name for sig in header))
+        self.assertEqual(callback.task, tasks.finalize_load.name)
+        replace.assert_called_once_with(chord.return_value)
+
+    def test_dispatcher_reports_a_bad_header(self):
+        result = tasks.process_uploaded_files_parallel(b"TXN DATE\n05-Jan-24\n", 'large.csv', 'karur_vysya', 'booking')
+        self.assertTrue(result.startswith("Failed to process large.csv: Missing columns"))
+
+    def test_large_csv_goes_to_the_dispatcher_in_one_group(self):
+        large = (BOOKING_HEADER + "05-Jan-24,100002,5002,10.50,06-Jan-24\n" * 20).encode()
+        jobs = [
+            (large, 'large.csv', 'karur_vysya', 'booking'),
+            (b'small', 'small.csv', 'karur_vysya', 'booking'),
+            (large, 'large.json', 'karur_vysya', 'booking'),
+        ]
+        with mock.patch.object(tasks, 'PARALLEL_CHUNK_BYTES', 100), mock.patch.object(tasks, 'group') as group:
+            results = tasks.process_uploaded_files_bulk(jobs)
+
+        self.assertEqual(results, group.return_value.apply_async.return_value.results)
+        signatures = group.call_args.args[0]
+        self.assertEqual(
+            [(sig.task, sig.args[1]) for sig in signatures],
+            [
+                (tasks.process_uploaded_files_parallel.name, 'large.csv'),
+                (tasks.process_uploaded_files.name, 'small.csv'),
+                (tasks.process_uploaded_files.name, 'large.json'),
+            ],
+        )
+
+
+class JsonUploadTests(UploadTestCase):
+    RECORDS = [
+        {'TXN DATE': '05-Jan-24', 'IRCTC ORDER NO.': '100002', 'BANK BOOKING REF.NO.': '5002',
+         'BOOKING AMOUNT': '10.50', 'CREDITED ON': '06-Jan-24'},
+        {'TXN DATE': '05-Jan-24', 'IRCTC ORDER NO.': '100003', 'BANK BOOKING REF.NO.': '5003',
+         'BOOKING AMOUNT': '20.00', 'CREDITED ON': '06-Jan-24'},
+    ]
+
+    def test_single_line_array_and_json_lines(self):
+        for content in (json.dumps(self.RECORDS), '\n'.join(json.dumps(record) for record in self.RECORDS)):
+            BookingData.objects.all().delete()
+            self.assertEqual(self.process(content, file_name='upload.json'), "Successfully processed upload.json")
+            self.assertEqual(
+                sorted(BookingData.objects.values_list('irctc_order_no', 'booking_amount')),
+                [(100002, 1050), (100003, 2000)],
+            )
+
+
+class AmountsToPaiseMigrationTests(TransactionTestCase):
+    BEFORE = [('upload', '0002_bookingdata_bd_order_ref_idx_and_more')]
+    AFTER = [('upload', '0003_amounts_to_paise')]
+    AMOUNTS = [Decimal('12345678.99'), Decimal('10.05'), Decimal('0.07'), None]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_amounts_round_trip_exactly(self):
+        old_apps = self.migrate(self.BEFORE)
+        OldBookingData = old_apps.get_model('upload', 'BookingData')
+        for i, amount in enumerate(self.AMOUNTS):
+            OldBookingData.objects.create(bank_code=1, irctc_order_no=i, bank_booking_ref_no=i, booking_amount=amount)
+
+        new_apps = self.migrate(self.AFTER)
+        NewBookingData = new_apps.get_model('upload', 'BookingData')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT booking_amount FROM upload_bookingdata ORDER BY irctc_order_no')
+            stored = [row[0] for row in cursor.fetchall()]
+        self.assertEqual(stored, [1234567899, 1005, 7, None])
+        self.assertTrue(all(type(value) is int for value in stored[:3]))
+        self.assertEqual(NewBookingData.objects.filter(booking_amount=1005).count(), 1)
+
+        old_apps = self.migrate(self.BEFORE)
+        OldBookingData = old_apps.get_model('upload', 'BookingData')
+        self.assertEqual(
+            list(OldBookingData.objects.order_by('irctc_order_no').values_list('booking_amount', flat=True)),
+            self.AMOUNTS,
+        )
@@ -2,7 +2,7 @@
 
 from django.shortcuts import render, redirect
 from .forms import UploadFileForm
-from .tasks import process_uploaded_files
+from .tasks import process_uploaded_files_bulk
 from django.http import HttpResponse
 from .models import BookingData, RefundData
 from celery.result import AsyncResult
@@ -12,20 +12,20 @@ from django.db import connection
 def upload_files(request):
     if request.method == 'POST':
         # Assume you have a file input named 'file' in your HTML form
-        uploaded_file = request.FILES['file']
+        uploaded_files = request.FILES.getlist('file')
         bank_name = request.POST.get('bank_name')  # Get bank name from the form
         transaction_type = request.POST.get('transaction_type')  # Get transaction type from the form
 
         # Read file content
-        file_content = uploaded_file.read()
-        file_name = uploaded_file.name
-        
-        task_ids = []
-
-        # Trigger the Celery task to process the file
-        result = process_uploaded_files.delay(file_content, file_name, bank_name, transaction_type)
-        
-        task_ids.append(result.id)  # Collect task IDs
+        jobs = [
+            (uploaded_file.read(), uploaded_file.name, bank_name, transaction_type)
+            for uploaded_file in uploaded_files
+        ]
+
+        # Trigger the Celery tasks for all files in one batched enqueue; large CSV files are split across workers
+        results = process_uploaded_files_bulk(jobs)
+
+        task_ids = [result.id for result in results]  # Collect task IDs
 
         # Store task IDs in session
         request.session['task_ids'] = task_ids